@@ -26,10 +26,19 @@ from aea.configurations.base import PublicId
 from aea.contracts.base import Contract
 from aea.crypto.base import LedgerApi
 from aea_ledger_ethereum import EthereumApi
+from eth_abi import encode
+from eth_utils import function_signature_to_4byte_selector
 
 
 PUBLIC_ID = PublicId.from_str("valory/betting:0.1.0")
 
+PLACE_BET_SELECTOR = function_signature_to_4byte_selector("placeBet(address,string)")
+
+
+def encode_place_bet_data(bettor: str, match_key: str) -> bytes:
+    """Encode a `placeBet` call. It needs no chain state, so it can be built locally."""
+    return PLACE_BET_SELECTOR + encode(["address", "string"], [bettor, match_key])
+
 
 class Betting(Contract):
     """The Betting contract."""
@@ -83,6 +92,4 @@ class Betting(Contract):
         match_key: str,
     ) -> Dict[str, bytes]:
         """Build a place bet transaction."""
-        contract_instance = cls.get_instance(ledger_api, contract_address)
-        data = contract_instance.encodeABI("placeBet", args=(bettor,match_key,))
-        return {"data": bytes.fromhex(data[2:])}
\ No newline at end of file
+        return {"data": encode_place_bet_data(bettor, match_key)}
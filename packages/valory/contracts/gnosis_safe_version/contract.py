@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""This module contains the class to read the version of a Gnosis Safe."""
+
+from aea.common import JSONLike
+from aea.configurations.base import PublicId
+from aea.contracts.base import Contract
+from aea_ledger_ethereum import EthereumApi
+
+
+PUBLIC_ID = PublicId.from_str("valory/gnosis_safe_version:0.1.0")
+
+
+class GnosisSafeVersionContract(Contract):
+    """The Gnosis Safe contract, reduced to its `VERSION` getter."""
+
+    contract_id = PUBLIC_ID
+
+    @classmethod
+    def get_safe_version(
+        cls,
+        ledger_api: EthereumApi,
+        contract_address: str,
+    ) -> JSONLike:
+        """Get the version of the Safe, which fixes the layout of its EIP-712 transaction hash."""
+        contract_instance = cls.get_instance(ledger_api, contract_address)
+        safe_version = contract_instance.functions.VERSION().call()
+        return dict(safe_version=safe_version)
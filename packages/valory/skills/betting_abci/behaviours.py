@@ -20,19 +20,39 @@
 """This package contains round behaviours of BettingAbciApp."""
 import asyncio
 import json
+import logging
 from abc import ABC
+from functools import lru_cache, partial
 from pathlib import Path
 from tempfile import mkdtemp
-from typing import Dict, Generator, Optional, Set, Type, cast
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Generator,
+    List,
+    Optional,
+    Type,
+    cast,
+)
+
+from aea.protocols.base import Message
+from eth_abi import encode
+from eth_abi.exceptions import EncodingError
+from eth_utils import function_signature_to_4byte_selector
 
-from packages.valory.contracts.betting.contract import Betting
+from packages.valory.contracts.betting.contract import Betting, encode_place_bet_data
 from packages.valory.contracts.gnosis_safe.contract import (
     GnosisSafeContract,
     SafeOperation,
 )
+from packages.valory.contracts.gnosis_safe_version.contract import (
+    GnosisSafeVersionContract,
+)
 from packages.valory.contracts.multisend.contract import (
-    MultiSendContract,
     MultiSendOperation,
+    to_bytes,
 )
 from packages.valory.protocols.contract_api import ContractApiMessage
 from packages.valory.protocols.ledger_api import LedgerApiMessage
@@ -41,7 +61,6 @@ from packages.valory.skills.abstract_round_abci.behaviours import (
     AbstractRoundBehaviour,
     BaseBehaviour,
 )
-from packages.valory.skills.abstract_round_abci.io_.store import SupportedFiletype
 from packages.valory.skills.betting_abci.models import (
     BettingSpecs,
     CoingeckoSpecs,
@@ -76,11 +95,37 @@ SAFE_GAS = 0
 VALUE_KEY = "value"
 TO_ADDRESS_KEY = "to_address"
 METADATA_FILENAME = "metadata.json"
+# The Safe gas is fixed, so it is bound once for the settlement payload
+hash_safe_payload_to_hex = partial(hash_payload_to_hex, safe_tx_gas=SAFE_GAS)
+MULTISEND_SELECTOR = function_signature_to_4byte_selector("multiSend(bytes)")
+
+
+@lru_cache(maxsize=1)
+def get_metadata_dir() -> str:
+    """Get the temporary directory for the metadata, created once per process."""
+    return mkdtemp()
+
+
+def encode_multisend_data(multi_send_txs: List[Dict]) -> bytes:
+    """Encode a `multiSend` call. It only packs the transactions, so it can be built locally."""
+    return MULTISEND_SELECTOR + encode(["bytes"], [to_bytes(multi_send_txs)])
+
+
+def store_compact_json(filename: str, obj: Any, **_: Any) -> Dict[str, str]:
+    """Serialize an object to compact JSON for IPFS."""
+    return {filename: json.dumps(obj, ensure_ascii=False, separators=(",", ":"))}
 
 
 class BettingBaseBehaviour(BaseBehaviour, ABC):  # pylint: disable=too-many-ancestors
     """Base behaviour for the betting_abci behaviours."""
 
+    def __init__(self, **kwargs: Any) -> None:
+        """Initialize the behaviour."""
+        super().__init__(**kwargs)
+        # index of the sub-step being advanced by `gather`, and its pending responses
+        self._gather_slot: Optional[int] = None
+        self._gather_inbox: Dict[int, Message] = {}
+
     @property
     def params(self) -> Params:
         """Return the params. Configs go here"""
@@ -109,15 +154,68 @@ class BettingBaseBehaviour(BaseBehaviour, ABC):  # pylint: disable=too-many-ance
     @property
     def metadata_filepath(self) -> str:
         """Get the temporary filepath to the metadata."""
-        return str(Path(mkdtemp()) / METADATA_FILENAME)
+        return str(Path(get_metadata_dir()) / METADATA_FILENAME)
+
+    def get_callback_request(self) -> Callable[[Message, BaseBehaviour], None]:
+        """Get the request callback, routing responses to the `gather` sub-step that sent the request."""
+        slot = self._gather_slot
+        if slot is None:
+            return super().get_callback_request()
+
+        def callback_request(
+            message: Message, current_behaviour: BaseBehaviour
+        ) -> None:
+            """Store the response for its sub-step and wake up the behaviour."""
+            if self.is_stopped:
+                self.context.logger.debug(
+                    "Dropping message as behaviour has stopped: %s", message
+                )
+            elif self != current_behaviour:
+                self.handle_late_messages(self.behaviour_id, message)
+            else:
+                self._gather_inbox[slot] = message
+                is_waiting = self.state == self.AsyncState.WAITING_MESSAGE
+                if is_waiting and not self.is_notified:
+                    self.try_send(message)
+
+        return callback_request
+
+    def gather(self, *steps: Generator) -> Generator[None, None, List[Any]]:
+        """
+        Run independent sub-steps concurrently and return their results in order.
+
+        The sub-steps are advanced round-robin, so their requests are in flight at the same time.
+        Each response is delivered only to the sub-step that issued the request.
+
+        :param steps: the generators to run.
+        :return: the return values of the sub-steps.
+        :yield: None
+        """
+        results: List[Any] = [None] * len(steps)
+        pending = dict(enumerate(steps))
+        self._gather_inbox = {}
+        try:
+            while True:
+                for slot, step in list(pending.items()):
+                    self._gather_slot = slot
+                    try:
+                        step.send(self._gather_inbox.pop(slot, None))
+                    except StopIteration as stop:
+                        results[slot] = stop.value
+                        del pending[slot]
+                    finally:
+                        self._gather_slot = None
+                if not pending:
+                    return results
+                yield
+        finally:
+            for step in pending.values():
+                step.close()
 
     def get_sync_timestamp(self) -> float:
         """Get the synchronized time from Tendermint's last block."""
-        now = cast(
-            SharedState, self.context.state
-        ).round_sequence.last_round_transition_timestamp.timestamp()
-
-        return now
+        round_sequence = self.local_state.round_sequence
+        return round_sequence.last_round_transition_timestamp.timestamp()
 
 
 class DataPullBehaviour(BettingBaseBehaviour):  # pylint: disable=too-many-ancestors
@@ -131,16 +229,20 @@ class DataPullBehaviour(BettingBaseBehaviour):  # pylint: disable=too-many-ances
         with self.context.benchmark_tool.measure(self.behaviour_id).local():
             sender = self.context.agent_address
 
-            # This call receive the betting result from the API
-            response = yield from self.get_betting_result_specs()
-            self.context.logger.info(f"Betting result API value: {response}")
+            # These calls receive the betting result from the API and the placed bet from the contract
+            # They do not depend on each other, so both requests are sent at the same time
+            response, has_placed_bet = yield from self.gather(
+                self.get_betting_result_specs(), self.get_has_placed_bet()
+            )
+            if self.context.logger.isEnabledFor(logging.INFO):
+                self.context.logger.info("Betting result API value: %s", response)
+                self.context.logger.info(
+                    "Placed bet value from contract: %s", has_placed_bet
+                )
 
             # Store the betting result in IPFS
             betting_ipfs_hash = yield from self.send_betting_result_to_ipfs(response)
 
-            has_placed_bet = yield from self.get_has_placed_bet()
-            self.context.logger.info(f"Placed bet value from contract: {has_placed_bet}")
-
             # Prepare the payload to be shared with other agents
             # After consensus, all the agents will have the same betting_result, betting_ipfs_hash and has_placed_bet variables in their synchronized data
             payload = DataPullPayload(
@@ -169,13 +271,14 @@ class DataPullBehaviour(BettingBaseBehaviour):  # pylint: disable=too-many-ances
         # Process the response
         response = self.betting_specs.process_response(raw_response)
 
-        self.context.logger.info(f"Got betting result from API: {response}")
+        if self.context.logger.isEnabledFor(logging.INFO):
+            self.context.logger.info("Got betting result from API: %s", response)
         return response
 
     def send_betting_result_to_ipfs(self, data) -> Generator[None, None, Optional[str]]:
         """Store the betting result in IPFS"""
         betting_ipfs_hash = yield from self.send_to_ipfs(
-            filename=self.metadata_filepath, obj=data, filetype=SupportedFiletype.JSON
+            filename=self.metadata_filepath, obj=data, custom_storer=store_compact_json
         )
         self.context.logger.info(
             f"Betting result data stored in IPFS: https://gateway.autonolas.tech/ipfs/{betting_ipfs_hash}"
@@ -184,9 +287,20 @@ class DataPullBehaviour(BettingBaseBehaviour):  # pylint: disable=too-many-ances
 
     def get_has_placed_bet(self) -> Generator[None, None, dict]:
         """Get the bet is already placed or not"""
-        self.context.logger.info(
-            f"Getting the bet is already placed or not for: {self.synchronized_data.safe_contract_address}"
-        )
+        logger = self.context.logger
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Getting the bet is already placed or not for: %s",
+                self.synchronized_data.safe_contract_address,
+            )
+
+        # Reuse the result if the bet is already known to be placed
+        bet_key = (self.params.transfer_target_address, self.params.match_key)
+        placed_bet = self.local_state.placed_bets.get(bet_key, None)
+        if placed_bet is not None:
+            logger.info("The bet is already placed, skipping the contract call")
+            return placed_bet
 
         # Use the contract api to interact with the Betting contract
         response_msg = yield from self.get_contract_api_response(
@@ -201,24 +315,27 @@ class DataPullBehaviour(BettingBaseBehaviour):  # pylint: disable=too-many-ances
 
         # Check that the response is what we expect
         if response_msg.performative != ContractApiMessage.Performative.RAW_TRANSACTION:
-            self.context.logger.error(
-                f"Error while retrieving the balance: {response_msg}"
-            )
+            logger.error("Error while retrieving the balance: %s", response_msg)
             return None
 
         response = response_msg.raw_transaction.body.get('data', None)
 
         # Ensure that the balance is not None
         if response is None:
-            self.context.logger.error(
-                f"Error while retrieving the betting placement result:  {response_msg}"
+            logger.error(
+                "Error while retrieving the betting placement result: %s", response_msg
             )
             return None
 
+        if response[0]:
+            self.local_state.placed_bets[bet_key] = response
 
-        self.context.logger.info(
-            f"Account {self.synchronized_data.safe_contract_address} betting placement result: {response}"
-        )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Account %s betting placement result: %s",
+                self.synchronized_data.safe_contract_address,
+                response,
+            )
         return response
 
 
@@ -277,6 +394,11 @@ class TxPreparationBehaviour(
 
     matching_round: Type[AbstractRound] = TxPreparationRound
 
+    def __init__(self, **kwargs: Any) -> None:
+        """Initialize the behaviour."""
+        super().__init__(**kwargs)
+        self._behaviour_id_cached = self.auto_behaviour_id()
+
     def async_act(self) -> Generator:
         """Do the act, supporting asynchronous execution."""
 
@@ -287,7 +409,7 @@ class TxPreparationBehaviour(
             tx_hash = yield from self.get_tx_hash()
 
             payload = TxPreparationPayload(
-                sender=sender, tx_submitter=self.auto_behaviour_id(), tx_hash=tx_hash
+                sender=sender, tx_submitter=self._behaviour_id_cached, tx_hash=tx_hash
             )
 
         with self.context.benchmark_tool.measure(self.behaviour_id).consensus():
@@ -305,13 +427,21 @@ class TxPreparationBehaviour(
 
         # All transactions need to be sent from the Safe controlled by the agents.
 
+        # Skip the contract calls if the synchronized data no longer calls for a bet
+        synchronized_data = self.synchronized_data
+        if not synchronized_data.betting_result or synchronized_data.has_placed_bet:
+            self.context.logger.info(
+                "Either betting result is False or the user has already placed the bet. Skipping transaction preparation."
+            )
+            return None
+
         # Again, make a decision based on the timestamp (on its last number)
         now = int(self.get_sync_timestamp())
         self.context.logger.info(f"Timestamp is {now}")
-        last_number = int(str(now)[-1])
+        last_number = now % 10
 
         # Betting transaction (Safe -> Betting contract)
-        if last_number in [0, 1, 2, 3, 4, 5, 6]:
+        if last_number < 7:
             self.context.logger.info("Preparing a betting transaction")
             tx_hash = yield from self.get_place_bet_safe_tx_hash()
             return tx_hash
@@ -332,15 +462,15 @@ class TxPreparationBehaviour(
         """Prepare a Betting safe transaction"""
 
         # Transaction data
-        data_hex = yield from self.get_place_bet_data()
+        data_bytes = self.get_place_bet_data()
 
         # Check for errors
-        if data_hex is None:
+        if data_bytes is None:
             return None
 
         # Prepare safe transaction
         safe_tx_hash = yield from self._build_safe_tx_hash(
-            to_address=self.params.betting_contract_address, data=bytes.fromhex(data_hex),
+            to_address=self.params.betting_contract_address, data=data_bytes,
             value=self.params.betting_amount
         )
 
@@ -348,43 +478,26 @@ class TxPreparationBehaviour(
 
         return safe_tx_hash
 
-    def get_place_bet_data(self) -> Generator[None, None, Optional[str]]:
+    def get_place_bet_data(self) -> Optional[bytes]:
         """Get the betting placement transaction data"""
 
         self.context.logger.info("Preparing betting placement transaction")
 
-        # Use the contract api to interact with the Betting contract
-        response_msg = yield from self.get_contract_api_response(
-            performative=ContractApiMessage.Performative.GET_RAW_TRANSACTION,  # type: ignore
-            contract_address=self.params.betting_contract_address,
-            contract_id=str(Betting.contract_id),
-            contract_callable="build_place_bet_tx",
-            match_key=self.params.match_key,
-            bettor=self.params.transfer_target_address,
-            chain_id=GNOSIS_CHAIN_ID,
-        )
-
-        # Check that the response is what we expect
-        if response_msg.performative != ContractApiMessage.Performative.RAW_TRANSACTION:
-            self.context.logger.error(
-                f"Error while retrieving the betting transaction: {response_msg}"
+        # The placeBet calldata needs no chain state, so it is encoded locally instead of through the contract api
+        try:
+            data_bytes = encode_place_bet_data(
+                bettor=self.params.transfer_target_address,
+                match_key=self.params.match_key,
             )
-            return None
-
-        data_bytes: Optional[bytes] = response_msg.raw_transaction.body.get(
-            "data", None
-        )
-
-        # Ensure that the data is not None
-        if data_bytes is None:
+        except EncodingError as e:
             self.context.logger.error(
-                f"Error while preparing the transaction: {response_msg}"
+                "Error while preparing the betting transaction: %s", e
             )
             return None
 
-        data_hex = data_bytes.hex()
-        self.context.logger.info(f"Betting transaction data is {data_hex}")
-        return data_hex
+        if self.context.logger.isEnabledFor(logging.INFO):
+            self.context.logger.info("Betting transaction data is %s", data_bytes.hex())
+        return data_bytes
 
     def get_multisend_safe_tx_hash(self) -> Generator[None, None, Optional[str]]:
         """Get a multisend transaction hash"""
@@ -406,9 +519,9 @@ class TxPreparationBehaviour(
         )
 
         # Betting transaction
-        place_bet_data_hex = yield from self.get_place_bet_data()
+        place_bet_data = self.get_place_bet_data()
 
-        if place_bet_data_hex is None:
+        if place_bet_data is None:
             return None
 
         multi_send_txs.append(
@@ -416,45 +529,62 @@ class TxPreparationBehaviour(
                 "operation": MultiSendOperation.CALL,
                 "to": self.params.betting_contract_address,
                 "value": self.params.betting_amount,
-                "data": bytes.fromhex(place_bet_data_hex),
+                "data": place_bet_data,
             }
         )
 
         # Multisend call
-        contract_api_msg = yield from self.get_contract_api_response(
-            performative=ContractApiMessage.Performative.GET_RAW_TRANSACTION,  # type: ignore
-            contract_address=self.params.multisend_address,
-            contract_id=str(MultiSendContract.contract_id),
-            contract_callable="get_tx_data",
-            multi_send_txs=multi_send_txs,
-            chain_id=GNOSIS_CHAIN_ID,
-        )
-
-        # Check for errors
-        if (
-            contract_api_msg.performative
-            != ContractApiMessage.Performative.RAW_TRANSACTION
-        ):
-            self.context.logger.error(
-                f"Could not get Multisend tx hash. "
-                f"Expected: {ContractApiMessage.Performative.RAW_TRANSACTION.value}, "
-                f"Actual: {contract_api_msg.performative.value}"
-            )
+        # multiSend only packs the transactions, so the calldata is encoded locally instead of through the contract api
+        try:
+            multisend_data = encode_multisend_data(multi_send_txs)
+        except (EncodingError, ValueError) as e:
+            self.context.logger.error("Could not get Multisend tx data: %s", e)
             return None
 
-        # Extract the multisend data and strip the 0x
-        multisend_data = cast(str, contract_api_msg.raw_transaction.body["data"])[2:]
-        self.context.logger.info(f"Multisend data is {multisend_data}")
+        if self.context.logger.isEnabledFor(logging.INFO):
+            self.context.logger.info("Multisend data is %s", multisend_data.hex())
 
         # Prepare the Safe transaction
         safe_tx_hash = yield from self._build_safe_tx_hash(
             to_address=self.params.multisend_address,
             value=ZERO_VALUE,  # the safe is not moving any native value into the multisend
-            data=bytes.fromhex(multisend_data),
+            data=multisend_data,
             operation=SafeOperation.DELEGATE_CALL.value,  # we are delegating the call to the multisend contract
         )
         return safe_tx_hash
 
+    def get_safe_version(self) -> Generator[None, None, Optional[str]]:
+        """Get the version of the Safe, reading it from the chain only once."""
+        safe_address = self.synchronized_data.safe_contract_address
+        safe_version = self.local_state.safe_versions.get(safe_address, None)
+        if safe_version is not None:
+            return safe_version
+
+        response_msg = yield from self.get_contract_api_response(
+            performative=ContractApiMessage.Performative.GET_STATE,  # type: ignore
+            contract_address=safe_address,
+            contract_id=str(GnosisSafeVersionContract.contract_id),
+            contract_callable="get_safe_version",
+            chain_id=GNOSIS_CHAIN_ID,
+        )
+
+        if response_msg.performative != ContractApiMessage.Performative.STATE:
+            self.context.logger.error(
+                "Couldn't get the Safe version: %s", response_msg
+            )
+            return None
+
+        safe_version = response_msg.state.body.get("safe_version", None)
+        if safe_version is None:
+            self.context.logger.error(
+                "Something went wrong while trying to get the Safe version: %s",
+                response_msg,
+            )
+            return None
+
+        self.local_state.safe_versions[safe_address] = safe_version
+        return safe_version
+
     def _build_safe_tx_hash(
         self,
         to_address: str,
@@ -463,12 +593,20 @@ class TxPreparationBehaviour(
         operation: int = SafeOperation.CALL.value,
     ) -> Generator[None, None, Optional[str]]:
         """Prepares and returns the safe tx hash for a multisend tx."""
+        logger = self.context.logger
 
-        self.context.logger.info(
-            f"Preparing Safe transaction [{self.synchronized_data.safe_contract_address}]"
-        )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Preparing Safe transaction [%s]",
+                self.synchronized_data.safe_contract_address,
+            )
+
+        safe_version = yield from self.get_safe_version()
+        if safe_version is None:
+            return None
 
         # Prepare the safe transaction
+        # The version never changes, so passing it leaves the Safe nonce as the only call that is repeated per round
         response_msg = yield from self.get_contract_api_response(
             performative=ContractApiMessage.Performative.GET_STATE,  # type: ignore
             contract_address=self.synchronized_data.safe_contract_address,
@@ -478,16 +616,18 @@ class TxPreparationBehaviour(
             value=value,
             data=data,
             safe_tx_gas=SAFE_GAS,
+            safe_version=safe_version,
             chain_id=GNOSIS_CHAIN_ID,
             operation=operation,
         )
 
         # Check for errors
         if response_msg.performative != ContractApiMessage.Performative.STATE:
-            self.context.logger.error(
-                "Couldn't get safe tx hash. Expected response performative "
-                f"{ContractApiMessage.Performative.STATE.value!r}, "  # type: ignore
-                f"received {response_msg.performative.value!r}: {response_msg}."
+            logger.error(
+                "Couldn't get safe tx hash. Expected response performative %r, received %r: %s.",
+                ContractApiMessage.Performative.STATE.value,  # type: ignore
+                response_msg.performative.value,
+                response_msg,
             )
             return None
 
@@ -495,25 +635,25 @@ class TxPreparationBehaviour(
         tx_hash: Optional[str] = response_msg.state.body.get("tx_hash", None)
 
         if tx_hash is None or len(tx_hash) != TX_HASH_LENGTH:
-            self.context.logger.error(
+            logger.error(
                 "Something went wrong while trying to get the safe transaction hash. "
-                f"Invalid hash {tx_hash!r} was returned."
+                "Invalid hash %r was returned.",
+                tx_hash,
             )
             return None
 
         # Transaction to hex
         tx_hash = tx_hash[2:]  # strip the 0x
 
-        safe_tx_hash = hash_payload_to_hex(
+        safe_tx_hash = hash_safe_payload_to_hex(
             safe_tx_hash=tx_hash,
             ether_value=value,
-            safe_tx_gas=SAFE_GAS,
             to_address=to_address,
             data=data,
             operation=operation,
         )
 
-        self.context.logger.info(f"Safe transaction hash is {safe_tx_hash}")
+        logger.info("Safe transaction hash is %s", safe_tx_hash)
 
         return safe_tx_hash
 
@@ -523,8 +663,10 @@ class BettingRoundBehaviour(AbstractRoundBehaviour):
 
     initial_behaviour_cls = DataPullBehaviour
     abci_app_cls = BettingAbciApp  # type: ignore
-    behaviours: Set[Type[BaseBehaviour]] = [  # type: ignore
-        DataPullBehaviour,
-        DecisionMakingBehaviour,
-        TxPreparationBehaviour,
-    ]
+    behaviours: FrozenSet[Type[BaseBehaviour]] = frozenset(
+        {
+            DataPullBehaviour,
+            DecisionMakingBehaviour,
+            TxPreparationBehaviour,
+        }
+    )
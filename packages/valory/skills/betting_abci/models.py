@@ -19,7 +19,7 @@
 
 """This module contains the shared state for the abci skill of BettingAbciApp."""
 
-from typing import Any
+from typing import Any, Dict, List, Tuple
 
 from packages.valory.skills.abstract_round_abci.models import ApiSpecs, BaseParams
 from packages.valory.skills.abstract_round_abci.models import (
@@ -37,6 +37,14 @@ class SharedState(BaseSharedState):
 
     abci_app_cls = BettingAbciApp
 
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """Initialize the state."""
+        super().__init__(*args, **kwargs)
+        # A placed bet can never be undone, so it only needs to be read from the contract once
+        self.placed_bets: Dict[Tuple[str, str], List] = {}
+        # The version of a Safe never changes, so it is read once per Safe
+        self.safe_versions: Dict[str, str] = {}
+
 
 Requests = BaseRequests
 BenchmarkTool = BaseBenchmarkTool
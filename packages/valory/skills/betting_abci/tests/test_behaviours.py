@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for valory/betting_abci skill's behaviours."""
+
+# pylint: skip-file
+
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, Generator, List, Optional
+from unittest.mock import MagicMock
+
+import pytest
+from web3 import Web3
+
+from packages.valory.contracts.betting.contract import encode_place_bet_data
+from packages.valory.contracts.multisend.contract import (
+    MultiSendOperation,
+    to_bytes,
+)
+from packages.valory.protocols.contract_api import ContractApiMessage
+from packages.valory.skills.abstract_round_abci.behaviour_utils import AsyncBehaviour
+from packages.valory.skills.betting_abci.behaviours import (
+    BettingBaseBehaviour,
+    DataPullBehaviour,
+    TxPreparationBehaviour,
+    encode_multisend_data,
+)
+from packages.valory.skills.betting_abci.rounds import DataPullRound
+
+
+SAFE_ADDRESS = "0x5FbDB2315678afecb367f032d93F642f64180aa3"
+TO_ADDRESS = "0xbc588Df1B9D5a1dDBD20e65ab62e4bF4ce272cb0"
+DATA = bytes.fromhex("db4f2da8") + bytes(40)
+
+CONTRACTS_DIR = Path(__file__).parents[3] / "contracts"
+
+
+def run(generator: Generator) -> Any:
+    """Run a behaviour step that receives all its responses right away, and return its result."""
+    try:
+        while True:
+            next(generator)
+    except StopIteration as stop:
+        return stop.value
+
+
+def mock_contract_api_response(
+    performative: ContractApiMessage.Performative, **body: Any
+) -> MagicMock:
+    """Mock `get_contract_api_response`, so that every request gets a response with the given body."""
+    response_msg = MagicMock(performative=performative)
+    response_msg.state.body = body
+    response_msg.raw_transaction.body = body
+
+    def get_contract_api_response(**_: Any) -> Generator[None, None, MagicMock]:
+        """Return the response without waiting for it."""
+        return response_msg
+        yield  # pragma: nocover
+
+    return MagicMock(side_effect=get_contract_api_response)
+
+
+def get_contract(build_path: str) -> Any:
+    """Get a web3 contract factory from a build artifact of the contracts packages."""
+    with open(CONTRACTS_DIR / build_path, encoding="utf-8") as build_file:
+        abi = json.load(build_file)["abi"]
+    return Web3().eth.contract(abi=abi)
+
+
+class TestLocalCalldata:
+    """Tests that the locally encoded calldata matches web3's ABI encoding."""
+
+    @staticmethod
+    @pytest.mark.parametrize("match_key", ("", "match_1", "é" * 40))
+    def test_encode_place_bet_data(match_key: str) -> None:
+        """Test `encode_place_bet_data` against the Betting contract ABI."""
+        betting = get_contract("betting/build/Betting.json")
+        expected = betting.encodeABI("placeBet", args=(TO_ADDRESS, match_key))
+        assert encode_place_bet_data(TO_ADDRESS, match_key) == bytes.fromhex(
+            expected[2:]
+        )
+
+    @staticmethod
+    @pytest.mark.parametrize("data", (b"", DATA, bytes(range(256)) * 4))
+    def test_encode_multisend_data(data: bytes) -> None:
+        """Test `encode_multisend_data` against the MultiSend contract ABI."""
+        multi_send_txs = [
+            {
+                "operation": MultiSendOperation.CALL,
+                "to": TO_ADDRESS,
+                "value": 1,
+            },
+            {
+                "operation": MultiSendOperation.CALL,
+                "to": SAFE_ADDRESS,
+                "value": 2,
+                "data": data,
+            },
+        ]
+        multisend = get_contract("multisend/build/MultiSend.json")
+        expected = multisend.encodeABI("multiSend", args=(to_bytes(multi_send_txs),))
+        assert encode_multisend_data(multi_send_txs) == bytes.fromhex(expected[2:])
+
+
+class GatherBehaviourTest(BettingBaseBehaviour):
+    """Concrete BettingBaseBehaviour that gathers requests whose responses are delivered by the tests."""
+
+    matching_round = DataPullRound
+
+    def __init__(self, **kwargs: Any) -> None:
+        """Initialize the behaviour."""
+        super().__init__(**kwargs)
+        self.steps: List[Generator] = []
+        self.callbacks: Dict[str, Callable] = {}
+        self.results: Optional[List[Any]] = None
+
+    def async_act_wrapper(self) -> Generator:
+        """Do async act wrapper. Forwards to 'async_act'."""
+        yield from self.async_act()
+
+    def async_act(self) -> Generator:
+        """Do 'async_act'."""
+        self.results = yield from self.gather(*self.steps)
+
+    def request(self, key: str) -> Generator[None, None, Any]:
+        """Send a request, the same way `_do_request` registers its callback, and wait for its response."""
+        self.callbacks[key] = self.get_callback_request()
+        response = yield from self.wait_for_message()
+        return response
+
+    @staticmethod
+    def cached(value: Any) -> Generator[None, None, Any]:
+        """Return a value without yielding, like a sub-step that hits a local cache."""
+        return value
+        yield  # pragma: nocover
+
+
+class TestGather:
+    """Tests for `BettingBaseBehaviour.gather` and its request callback."""
+
+    def setup_method(self) -> None:
+        """Set up the test."""
+        self.behaviour = GatherBehaviourTest(name="", skill_context=MagicMock())
+
+    def deliver(self, key: str, message: Any) -> None:
+        """Deliver the response of a request to the behaviour."""
+        self.behaviour.callbacks[key](message, self.behaviour)
+
+    @pytest.mark.parametrize("order", (("a", "b"), ("b", "a")))
+    def test_responses_in_any_order(self, order: List[str]) -> None:
+        """Test that each response reaches the sub-step that sent its request, whatever the arrival order."""
+        self.behaviour.steps = [
+            self.behaviour.request("a"),
+            self.behaviour.request("b"),
+        ]
+        self.behaviour.act()
+        # both requests are in flight before any response arrives
+        assert set(self.behaviour.callbacks) == {"a", "b"}
+        assert self.behaviour.state == AsyncBehaviour.AsyncState.WAITING_MESSAGE
+
+        first, second = order
+        self.deliver(first, first + "_response")
+        self.behaviour.act()
+        assert self.behaviour.results is None
+
+        self.deliver(second, second + "_response")
+        self.behaviour.act()
+        assert self.behaviour.results == ["a_response", "b_response"]
+
+    def test_responses_in_the_same_tick(self) -> None:
+        """Test that both responses are consumed when they arrive before the next tick."""
+        self.behaviour.steps = [
+            self.behaviour.request("a"),
+            self.behaviour.request("b"),
+        ]
+        self.behaviour.act()
+
+        self.deliver("b", "b_response")
+        assert self.behaviour.is_notified
+        # the behaviour is already notified, so the second response must only be stored
+        self.deliver("a", "a_response")
+        self.behaviour.act()
+        assert self.behaviour.results == ["a_response", "b_response"]
+
+    def test_step_without_yield(self) -> None:
+        """Test a sub-step that returns without yielding, e.g. on a cache hit."""
+        self.behaviour.steps = [
+            self.behaviour.cached("cached"),
+            self.behaviour.request("b"),
+        ]
+        self.behaviour.act()
+        assert set(self.behaviour.callbacks) == {"b"}
+
+        self.deliver("b", "b_response")
+        self.behaviour.act()
+        assert self.behaviour.results == ["cached", "b_response"]
+
+    def test_no_step_yields(self) -> None:
+        """Test that `gather` returns right away when no sub-step yields."""
+        self.behaviour.steps = [self.behaviour.cached(1), self.behaviour.cached(2)]
+        self.behaviour.act()
+        assert self.behaviour.results == [1, 2]
+
+    def test_late_message(self) -> None:
+        """Test that a response arriving after the behaviour switched is handled as a late message."""
+        self.behaviour.steps = [
+            self.behaviour.request("a"),
+            self.behaviour.request("b"),
+        ]
+        self.behaviour.act()
+        self.behaviour.handle_late_messages = MagicMock()  # type: ignore
+
+        message = MagicMock()
+        self.behaviour.callbacks["a"](message, MagicMock())
+        self.behaviour.handle_late_messages.assert_called_once_with(
+            self.behaviour.behaviour_id, message
+        )
+        assert not self.behaviour.is_notified
+        assert self.behaviour._gather_inbox == {}
+
+    def test_message_after_stop(self) -> None:
+        """Test that a response arriving after the behaviour stopped is dropped."""
+        self.behaviour.steps = [
+            self.behaviour.request("a"),
+            self.behaviour.request("b"),
+        ]
+        self.behaviour.act()
+        self.behaviour.stop()
+
+        self.deliver("a", "a_response")
+        assert not self.behaviour.is_notified
+        assert self.behaviour._gather_inbox == {}
+
+
+class TestGetHasPlacedBet:
+    """Tests for `DataPullBehaviour.get_has_placed_bet`."""
+
+    def setup_method(self) -> None:
+        """Set up the test."""
+        self.behaviour = DataPullBehaviour(name="", skill_context=MagicMock())
+        self.behaviour.context.state.placed_bets = {}
+        self.behaviour.context.params.transfer_target_address = TO_ADDRESS
+        self.behaviour.context.params.match_key = "match_1"
+
+    def test_placed_bet_is_stored(self) -> None:
+        """Test that a placed bet is stored and returned without a contract request afterwards."""
+        placed_bet = [True, 10, "match_1"]
+        self.behaviour.get_contract_api_response = mock_contract_api_response(  # type: ignore
+            ContractApiMessage.Performative.RAW_TRANSACTION, data=placed_bet
+        )
+        assert run(self.behaviour.get_has_placed_bet()) == placed_bet
+        self.behaviour.get_contract_api_response.assert_called_once()
+        assert self.behaviour.context.state.placed_bets == {
+            (TO_ADDRESS, "match_1"): placed_bet
+        }
+
+        assert run(self.behaviour.get_has_placed_bet()) == placed_bet
+        self.behaviour.get_contract_api_response.assert_called_once()
+
+    def test_bet_not_placed_is_not_stored(self) -> None:
+        """Test that a bet that is not placed yet is read from the contract again."""
+        not_placed_bet = [False, 0, ""]
+        self.behaviour.get_contract_api_response = mock_contract_api_response(  # type: ignore
+            ContractApiMessage.Performative.RAW_TRANSACTION, data=not_placed_bet
+        )
+        assert run(self.behaviour.get_has_placed_bet()) == not_placed_bet
+        assert self.behaviour.context.state.placed_bets == {}
+
+        assert run(self.behaviour.get_has_placed_bet()) == not_placed_bet
+        assert self.behaviour.get_contract_api_response.call_count == 2
+
+
+class TestGetSafeVersion:
+    """Tests for `TxPreparationBehaviour.get_safe_version`."""
+
+    def setup_method(self) -> None:
+        """Set up the test."""
+        self.behaviour = TxPreparationBehaviour(name="", skill_context=MagicMock())
+        self.behaviour.context.state.safe_versions = {}
+        self.behaviour.context.state.synchronized_data.safe_contract_address = (
+            SAFE_ADDRESS
+        )
+
+    def test_version_is_read_once(self) -> None:
+        """Test that the Safe version is read from the chain once, and then reused."""
+        self.behaviour.get_contract_api_response = mock_contract_api_response(  # type: ignore
+            ContractApiMessage.Performative.STATE, safe_version="1.3.0"
+        )
+        assert run(self.behaviour.get_safe_version()) == "1.3.0"
+        assert run(self.behaviour.get_safe_version()) == "1.3.0"
+        self.behaviour.get_contract_api_response.assert_called_once()
+        assert self.behaviour.context.state.safe_versions == {SAFE_ADDRESS: "1.3.0"}
+
+    def test_error_is_not_stored(self) -> None:
+        """Test that a failed read is not stored, so it is retried in the next round."""
+        self.behaviour.get_contract_api_response = mock_contract_api_response(  # type: ignore
+            ContractApiMessage.Performative.ERROR
+        )
+        assert run(self.behaviour.get_safe_version()) is None
+        assert self.behaviour.context.state.safe_versions == {}